@@ -1,6 +1,11 @@
 from models.model_loader import ModelLoader
 from services.vector_db import VectorDB
+from services.sharded_vector_db import ShardedVectorDB
+from services.compact_store import CompactVectorStore
+from services.index_snapshots import SnapshotManager, HotSwapIndex
+from services.summary_index import BROAD_LEVELS, parse_period, query_periods
 import json
+import os
 import re
 
 class QueryHandler:
@@ -10,7 +15,8 @@ class QueryHandler:
     This class handles the entire query processing pipeline, including:
     1. Loading and managing prompt templates
     2. Embedding queries
-    3. Searching for relevant documents in a vector database
+    3. Searching for relevant documents in a vector database, or in the precomputed
+       summary index for cross-company and period-level questions
     4. Preparing context from similar documents
     5. Generating responses using OpenAI's language model
 
@@ -19,18 +25,46 @@ class QueryHandler:
             - 'embedding_model': Name of the embedding model to use
             - 'openai_api_key': API key for OpenAI services
             - Vector database configuration parameters
+            - 'sharding': Optional shard settings; when the SHARDS_PATH environment
+              variable is set, searches are fanned out across the shards in it
+            - 'snapshots': Optional snapshot settings; when the SNAPSHOTS_PATH environment
+              variable is set, searches run against the current snapshot there and newer
+              snapshots are hot-swapped in as they are published
+            - 'summaries': Optional summary settings; when the SUMMARY_CHROMA_PATH environment
+              variable is set, broad questions are answered from the summary index built
+              by services.summary_index
+            - 'compact_store': Optional quantization settings; when the COMPACT_STORE_PATH
+              environment variable is set, searches run against the compact store saved there
             - Any other necessary configuration options
 
     Attributes:
         model_loader (ModelLoader): An instance of ModelLoader for embedding and language model operations
-        vector_db (VectorDB): An instance of VectorDB for similarity search operations
+        vector_db (VectorDB | ShardedVectorDB | HotSwapIndex | CompactVectorStore): The store used for similarity search operations
+        summary_db (VectorDB | None): The summary index, if one is configured
         templates (dict): A dictionary of prompt templates loaded from a JSON file
     """
     def __init__(self,
                  config,
                  templates_path):
         self.model_loader = ModelLoader(**config)
-        self.vector_db = VectorDB(embedder=self.model_loader)
+        self.model_loader.load_embedding_model()
+        shards_path = os.environ.get("SHARDS_PATH")
+        snapshots_path = os.environ.get("SNAPSHOTS_PATH")
+        compact_store_path = os.environ.get("COMPACT_STORE_PATH")
+        if shards_path:
+            self.vector_db = ShardedVectorDB(config, shards_path, embedder=self.model_loader)
+        elif snapshots_path:
+            manager = SnapshotManager.from_config(snapshots_path, config)
+            poll_interval = config.get("snapshots", {}).get("poll_interval", 10)
+            self.vector_db = HotSwapIndex(manager).watch(poll_interval)
+        elif compact_store_path:
+            self.vector_db = CompactVectorStore.load(compact_store_path)
+        else:
+            self.vector_db = VectorDB(embedder=self.model_loader)
+
+        summary_path = os.environ.get("SUMMARY_CHROMA_PATH")
+        self.summary_db = VectorDB(embedder=self.model_loader, chroma_path=summary_path) if summary_path else None
+        self.summary_k = config.get("summaries", {}).get("search_k", 4)
         self.templates_path = templates_path
         self.load_templates()
 
@@ -39,8 +73,13 @@ class QueryHandler:
             self.templates = json.load(f)
 
     def process_query(self, query):
-        query_embedding = self.model_loader.get_embeddings([query])[0]
-        similar_docs = self.vector_db.search(query_embedding)
+        # get_embeddings squeezes a single text down to one (embedding_dimension,) vector
+        query_embedding = self.model_loader.get_embeddings([query])
+        summary_filter = self.summary_filter(query) if self.summary_db is not None else None
+        if summary_filter is not None:
+            similar_docs = self.summary_db.search(query_embedding, k=self.summary_k, filter=summary_filter)
+        else:
+            similar_docs = self.vector_db.search(query_embedding)
         if len(similar_docs) > 0:
             context = self.prepare_context(similar_docs)
         else:
@@ -80,6 +119,33 @@ class QueryHandler:
         context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in similar_docs])
         return context_text
 
+    def summary_filter(self, query):
+        """
+        Return the Chroma filter to answer a query from the summary index with, or None
+        if the query needs chunk-level detail. Broad queries are restricted to the
+        period they ask about, so summaries of other periods are not mixed in.
+        """
+        summaries = self.summary_db.get_metadatas(filter={"level": {"$in": BROAD_LEVELS}})
+        companies = {metadata["company"] for metadata in summaries if metadata.get("company")}
+        if not self.is_broad_query(query, companies):
+            return None
+        level_filter = {"level": {"$in": BROAD_LEVELS}}
+        periods = query_periods(query, {metadata.get("period") for metadata in summaries} - {None})
+        if not periods:
+            return level_filter
+        return {"$and": [level_filter, {"period": {"$in": periods}}]}
+
+    def is_broad_query(self, query, companies=()):
+        query_lower = query.lower()
+        # Only explicit multi-entity terms: "across segments" or "compare to last quarter"
+        # are single-company questions that need chunk-level detail.
+        if re.search(r'\bsectors?\b|\bindustr(y|ies)\b|\bcompanies\b|'
+                     r'\b(top|best|worst)[ -]performing\b', query_lower):
+            return True
+        # A named period ("Q2 2024") without a named company asks about the whole market.
+        names_company = any(company.lower().replace("_", " ") in query_lower for company in companies)
+        return parse_period(query) is not None and not names_company
+
     def get_relevant_template(self, query):
         query_lower = query.lower()
         if re.search(r'income|revenue|profit|eps', query_lower):
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+
+import httpx
+import openai
+from openai import OpenAI
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError)
+
+
+class UsageTracker:
+    """
+    Thread-safe running totals of token usage and cost, per model.
+
+    Prices are given in USD per million tokens, e.g. {"gpt-4o-mini": {"input": 0.15, "output": 0.60}}.
+    """
+    def __init__(self, prices: dict = None):
+        self.prices = prices or {}
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        price = self.prices.get(model, {})
+        cost = (prompt_tokens * price.get("input", 0.0)
+                + completion_tokens * price.get("output", 0.0)) / 1_000_000
+        with self._lock:
+            totals = self.totals.setdefault(model, {"requests": 0, "prompt_tokens": 0,
+                                                    "completion_tokens": 0, "cost": 0.0})
+            totals["requests"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cost"] += cost
+        return cost
+
+    @property
+    def total_cost(self) -> float:
+        with self._lock:
+            return sum(totals["cost"] for totals in self.totals.values())
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {model: dict(totals) for model, totals in self.totals.items()}
+
+
+class LLMClient:
+    """
+    LLMClient wraps the OpenAI chat completions API for concurrent use.
+
+    Key components:
+    1. A single pooled httpx client shared by every call, so connections are reused.
+    2. A deadline per call: retries never run past `timeout` seconds in total.
+    3. Retries on 429, 5xx and connection errors with full-jitter exponential backoff,
+       honouring the server's Retry-After header when it sends one.
+    4. Coalescing: concurrent calls with identical model, messages and parameters
+       share one in-flight completion instead of each paying for their own.
+    5. Streaming via `stream`, yielding content deltas as they arrive.
+    6. Token usage and cost tracking in `usage`.
+
+    Pointing `base_url` at models.stub_llm_server runs everything against a local stand-in.
+    """
+    def __init__(self,
+                 api_key: str = None,
+                 model: str = "gpt-4o-mini",
+                 base_url: str = None,
+                 timeout: float = 30.0,
+                 max_retries: int = 4,
+                 backoff_base: float = 0.5,
+                 backoff_max: float = 8.0,
+                 max_connections: int = 20,
+                 prices: dict = None):
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.usage = UsageTracker(prices)
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+        # Retries are handled here so they share the call deadline and coalescing.
+        self.client = OpenAI(api_key=api_key,
+                             base_url=base_url,
+                             http_client=self._http_client,
+                             timeout=timeout,
+                             max_retries=0)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        settings = config.get("llm", {})
+        # config.yaml holds "${OPENAI_API_KEY}"; an unresolved value falls back to the
+        # OpenAI client's own environment lookup.
+        api_key = os.path.expandvars(str(config.get("openai_api_key") or ""))
+        if not api_key or api_key.startswith("$"):
+            api_key = None
+        return cls(api_key=api_key,
+                   model=settings.get("model", "gpt-4o-mini"),
+                   base_url=settings.get("base_url"),
+                   timeout=settings.get("timeout", 30.0),
+                   max_retries=settings.get("max_retries", 4),
+                   backoff_base=settings.get("backoff_base", 0.5),
+                   backoff_max=settings.get("backoff_max", 8.0),
+                   max_connections=settings.get("max_connections", 20),
+                   prices=settings.get("prices"))
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                pass
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _with_retries(self, request, timeout: float):
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return request(remaining)
+            except RETRYABLE_ERRORS as e:
+                delay = self._backoff(attempt, e)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    raise
+                attempt += 1
+                logger.warning(f"LLM request failed ({e.__class__.__name__}), "
+                               f"retry {attempt}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _record_usage(self, model: str, usage):
+        if usage is not None:
+            self.usage.record(model, usage.prompt_tokens, usage.completion_tokens)
+
+    def _complete(self, messages: list[dict], model: str, timeout: float, params: dict) -> str:
+        completion = self._with_retries(
+            lambda remaining: self.client.chat.completions.create(
+                model=model, messages=messages, timeout=remaining, **params),
+            timeout
+        )
+        self._record_usage(model, completion.usage)
+        return completion.choices[0].message.content
+
+    def chat(self, messages: list[dict], model: str = None, timeout: float = None, **params) -> str:
+        """
+        Return the completion for a list of chat messages.
+
+        Args:
+            messages (list[dict]): OpenAI-style chat messages.
+            model (str, optional): Overrides the configured model.
+            timeout (float, optional): Deadline in seconds for the call, retries included.
+            **params: Extra completion parameters (temperature, max_tokens...).
+
+        Returns:
+            str: The generated text.
+        """
+        model = model or self.model
+        timeout = timeout or self.timeout
+        key = hashlib.sha256(
+            json.dumps({"model": model, "messages": messages, "params": params},
+                       sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            return future.result(timeout=timeout)
+
+        try:
+            future.set_result(self._complete(messages, model, timeout, params))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+        return future.result()
+
+    def stream(self, messages: list[dict], model: str = None, timeout: float = None, **params):
+        """
+        Yield the completion for a list of chat messages as content deltas.
+
+        Retries only happen before the stream is opened; usage is recorded once
+        the stream has been fully consumed.
+        """
+        model = model or self.model
+        timeout = timeout or self.timeout
+        chunks = self._with_retries(
+            lambda remaining: self.client.chat.completions.create(
+                model=model, messages=messages, timeout=remaining, stream=True,
+                stream_options={"include_usage": True}, **params),
+            timeout
+        )
+        with chunks:
+            for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                self._record_usage(model, getattr(chunk, "usage", None))
+
+    def close(self):
+        self._http_client.close()
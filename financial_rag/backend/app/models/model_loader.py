@@ -1,9 +1,9 @@
 from transformers import AutoModel, AutoTokenizer
-import openai
-from openai import OpenAI
 import torch
 from tqdm import tqdm
 
+from .llm_client import LLMClient
+
 class ModelLoader:
     """
     This method explains the functionality of the ModelLoader class.
@@ -13,7 +13,7 @@ class ModelLoader:
     Key components:
     1. Initialization (__init__):
        - Stores the configuration, including the OpenAI API key.
-       - Initializes embedding_model and tokenizer as None.
+       - Initializes embedding_model, tokenizer and the LLM client as None.
 
     2. load_embedding_model:
        - Loads a pre-trained model and tokenizer based on the configuration.
@@ -24,9 +24,11 @@ class ModelLoader:
        - Tokenizes the input, passes it through the model, and returns the mean of the last hidden state.
 
     4. query_openai:
-       - Sends a prompt to OpenAI's API for text completion.
-       - Uses the stored API key for authentication.
-       - Returns the generated text response.
+       - Sends a prompt to OpenAI's API for text completion through a shared LLMClient,
+         created on first use from the 'llm' section of the configuration.
+       - The client pools connections, enforces a deadline, retries rate limits and
+         server errors with backoff, coalesces identical in-flight prompts and tracks usage.
+       - Returns the generated text response, or a generator of text deltas when stream=True.
 
     This class combines local embedding capabilities with OpenAI's powerful language model,
     allowing for versatile text processing and generation tasks.
@@ -36,7 +38,13 @@ class ModelLoader:
         self.embedding_model = None
         self.tokenizer = None
         self.openai_api_key = config['openai_api_key']
-        self.client = OpenAI()
+        self._llm_client = None
+
+    @property
+    def llm_client(self):
+        if self._llm_client is None:
+            self._llm_client = LLMClient.from_config(self.config)
+        return self._llm_client
 
     def load_embedding_model(self):
         model_name = self.config['embedding_model']
@@ -49,14 +57,9 @@ class ModelLoader:
             outputs = self.embedding_model(**inputs)
         return outputs.last_hidden_state.mean(dim=1).squeeze().numpy()
 
-    def query_openai(self, prompt):
-        openai.api_key = self.openai_api_key
-
-        # gets API Key from environment variable OPENAI_API_KEY
-        completion = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=prompt
-            )
-        output = completion.choices[0].message.content
+    def query_openai(self, prompt, stream=False, **params):
+        if stream:
+            return self.llm_client.stream(prompt, **params)
+        output = self.llm_client.chat(prompt, **params)
 
         return output
\ No newline at end of file
@@ -0,0 +1,168 @@
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMServer:
+    """
+    A local stand-in for the OpenAI chat completions endpoint, for tests and load runs.
+
+    It answers POST .../chat/completions with a canned reply echoing the last user
+    message, in both regular and streaming (server-sent events) form, and reports
+    word-count based token usage. It can simulate latency and fail a fraction of
+    requests with 429 (with a Retry-After header) or 500 responses, or fail the
+    first `fail_first` requests with `fail_status` for deterministic tests.
+
+    Usage:
+        with StubLLMServer(rate_limit_rate=0.2) as server:
+            client = LLMClient(api_key="test", base_url=server.base_url)
+            ...
+            server.request_count  # completions actually served
+            server.attempt_count  # every request received, failed ones included
+    """
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 error_rate: float = 0.0,
+                 retry_after: float = 0.05,
+                 fail_first: int = 0,
+                 fail_status: int = 429):
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.request_count = 0
+        self.attempt_count = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_error(self, status):
+                if status == 429:
+                    self._send_json(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                    headers={"Retry-After": str(server.retry_after)})
+                else:
+                    self._send_json(status, {"error": {"message": "server error", "type": "server_error"}})
+
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                time.sleep(server.latency)
+
+                with server._lock:
+                    server.attempt_count += 1
+                    forced_failure = server.attempt_count <= server.fail_first
+                if forced_failure:
+                    self._send_error(server.fail_status)
+                    return
+                roll = random.random()
+                if roll < server.rate_limit_rate:
+                    self._send_error(429)
+                    return
+                if roll < server.rate_limit_rate + server.error_rate:
+                    self._send_error(500)
+                    return
+
+                with server._lock:
+                    server.request_count += 1
+                prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+                user_messages = [m for m in request.get("messages", []) if m.get("role") == "user"]
+                last_user = user_messages[-1]["content"] if user_messages else ""
+                content = f"Stub response to: {last_user}"
+                usage = {"prompt_tokens": len(prompt.split()),
+                         "completion_tokens": len(content.split()),
+                         "total_tokens": len(prompt.split()) + len(content.split())}
+                base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": request.get("model")}
+
+                if request.get("stream"):
+                    self._stream(base, content, usage)
+                    return
+                self._send_json(200, dict(base, object="chat.completion", usage=usage, choices=[{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }]))
+
+            def _stream(self, base, content, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                events = [dict(base, object="chat.completion.chunk", choices=[{
+                    "index": 0, "delta": {"content": word + " "}, "finish_reason": None}])
+                    for word in content.split()]
+                events.append(dict(base, object="chat.completion.chunk", choices=[], usage=usage))
+                for event in events:
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the OpenAI chat API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.latency, args.rate_limit_rate, args.error_rate)
+    print(f"Stub LLM server listening on {server.base_url}")
+    server._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import os
+import json
+import argparse
+import logging
+
+import numpy as np
+from langchain.schema import Document
+
+from dotenv import load_dotenv
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MODES = ("float32", "float16", "int8", "pq")
+BLOCK_SIZE = 4096
+
+
+def _kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    # Plain Lloyd iterations; data is small (one PQ subspace of a training sample).
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        distances = (np.sum(data ** 2, axis=1, keepdims=True)
+                     - 2 * data @ centroids.T
+                     + np.sum(centroids ** 2, axis=1))
+        assignment = distances.argmin(axis=1)
+        for c in range(n_clusters):
+            members = data[assignment == c]
+            if len(members):
+                centroids[c] = members.mean(axis=0)
+    return centroids
+
+
+class CompactVectorStore:
+    """
+    CompactVectorStore keeps chunk embeddings in a compressed in-memory form and re-ranks exactly.
+
+    Supported modes:
+    - float32: Full-precision vectors, no compression (baseline).
+    - float16: Half-precision vectors, 2 bytes per dimension.
+    - int8: Per-dimension scalar quantization, 1 byte per dimension.
+    - pq: Product quantization, 1 byte per subspace (e.g. 96 bytes for 768 dimensions).
+
+    Search runs a coarse pass over the compressed codes, then re-ranks the top
+    k * rerank_factor candidates against the full-precision float32 vectors. Once saved,
+    the full vectors are only read back from disk (memory-mapped) for those candidates.
+    Chunk texts and metadata are saved as one JSON record per row in a blob with an
+    offset index, so a loaded store maps them and only decodes the rows it returns.
+    Distances are squared L2, matching Chroma's default.
+    """
+    def __init__(self,
+                 mode: str = "int8",
+                 pq_subspaces: int = 96,
+                 pq_centroids: int = 256,
+                 rerank_factor: int = 10):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.mode = mode
+        self.pq_subspaces = pq_subspaces
+        self.pq_centroids = pq_centroids
+        self.rerank_factor = rerank_factor
+        self.path = None
+        self.codes = None
+        self.params = {}
+        self._vectors = None
+        self._records = []
+        self._record_blob = None
+        self._record_offsets = None
+
+    @classmethod
+    def from_config(cls, config: dict):
+        settings = config.get("compact_store", {})
+        return cls(mode=settings.get("mode", "int8"),
+                   pq_subspaces=settings.get("pq_subspaces", 96),
+                   pq_centroids=settings.get("pq_centroids", 256),
+                   rerank_factor=settings.get("rerank_factor", 10))
+
+    def build(self,
+              ids: list[str],
+              embeddings: np.ndarray,
+              documents: list[str],
+              metadatas: list[dict]):
+        """
+        Quantize a set of embeddings.
+
+        Args:
+            ids (list[str]): Chunk IDs.
+            embeddings (np.ndarray): float32 array of shape (n, dim); kept by reference, not copied.
+            documents (list[str]): Chunk texts.
+            metadatas (list[dict]): Chunk metadata.
+
+        Returns:
+            CompactVectorStore: self, for chaining.
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        self._records = list(zip(ids, documents, metadatas))
+        self._vectors = vectors
+
+        if self.mode == "float32":
+            self.codes = vectors
+        elif self.mode == "float16":
+            self.codes = vectors.astype(np.float16)
+        elif self.mode == "int8":
+            mins = vectors.min(axis=0)
+            scales = np.maximum(vectors.max(axis=0) - mins, 1e-12) / 255.0
+            self.params = {"mins": mins, "scales": scales.astype(np.float32)}
+            self.codes = (np.rint((vectors - mins) / scales) - 128).astype(np.int8)
+        elif self.mode == "pq":
+            self.params = {"centroids": self._train_pq(vectors)}
+            self.codes = self._encode_pq(vectors)
+
+        logger.info(f"Built {self.mode} store: {self.size} vectors, "
+                    f"{self.codes.nbytes / 2**20:.1f} MiB of codes")
+        return self
+
+    @property
+    def size(self) -> int:
+        return 0 if self.codes is None else len(self.codes)
+
+    def record(self, row: int) -> tuple[str, str, dict]:
+        """
+        Return the (id, document, metadata) of a row.
+        """
+        if self._record_offsets is None:
+            return self._records[row]
+        start, end = self._record_offsets[row], self._record_offsets[row + 1]
+        return tuple(json.loads(bytes(self._record_blob[start:end])))
+
+    @property
+    def dimension(self) -> int:
+        if self.mode == "pq":
+            n_sub, _, sub_dim = self.params["centroids"].shape
+            return n_sub * sub_dim
+        return self.codes.shape[1]
+
+    def _train_pq(self, vectors: np.ndarray, sample_size: int = 20000) -> np.ndarray:
+        n, dim = vectors.shape
+        if dim % self.pq_subspaces:
+            raise ValueError(f"Dimension {dim} is not divisible by pq_subspaces={self.pq_subspaces}")
+        n_clusters = min(self.pq_centroids, n)
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(n, min(n, sample_size), replace=False)]
+        sub_dim = dim // self.pq_subspaces
+        return np.stack([
+            _kmeans(sample[:, j * sub_dim:(j + 1) * sub_dim], n_clusters)
+            for j in range(self.pq_subspaces)
+        ]).astype(np.float32)
+
+    def _encode_pq(self, vectors: np.ndarray) -> np.ndarray:
+        centroids = self.params["centroids"]
+        n_sub, _, sub_dim = centroids.shape
+        codes = np.empty((len(vectors), n_sub), dtype=np.uint8)
+        for start in range(0, len(vectors), BLOCK_SIZE):
+            block = vectors[start:start + BLOCK_SIZE]
+            for j in range(n_sub):
+                sub = block[:, j * sub_dim:(j + 1) * sub_dim]
+                distances = np.sum(sub ** 2, axis=1, keepdims=True) - 2 * sub @ centroids[j].T \
+                    + np.sum(centroids[j] ** 2, axis=1)
+                codes[start:start + BLOCK_SIZE, j] = distances.argmin(axis=1)
+        return codes
+
+    def _decode_block(self, block: np.ndarray) -> np.ndarray:
+        if self.mode == "int8":
+            return (block.astype(np.float32) + 128) * self.params["scales"] + self.params["mins"]
+        return np.asarray(block, dtype=np.float32)
+
+    def _coarse_distances(self, query: np.ndarray) -> np.ndarray:
+        distances = np.empty(self.size, dtype=np.float32)
+        if self.mode == "pq":
+            centroids = self.params["centroids"]
+            n_sub, _, sub_dim = centroids.shape
+            table = np.sum((centroids - query.reshape(n_sub, 1, sub_dim)) ** 2, axis=2)
+            rows = np.arange(n_sub)
+            for start in range(0, self.size, BLOCK_SIZE):
+                block = self.codes[start:start + BLOCK_SIZE]
+                distances[start:start + BLOCK_SIZE] = table[rows, block].sum(axis=1)
+            return distances
+        for start in range(0, self.size, BLOCK_SIZE):
+            block = self._decode_block(self.codes[start:start + BLOCK_SIZE])
+            distances[start:start + BLOCK_SIZE] = np.sum((block - query) ** 2, axis=1)
+        return distances
+
+    def _full_vectors(self) -> np.ndarray:
+        return self._vectors
+
+    def search_ids(self, query_embedding, k: int = 5, rerank: bool = True) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the row indices and squared L2 distances of the k nearest vectors.
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        if query.shape[0] != self.dimension:
+            raise ValueError(f"Query has dimension {query.shape[0]}, store has {self.dimension}")
+        k = min(k, self.size)
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        distances = self._coarse_distances(query)
+
+        n_candidates = k
+        if rerank and self.mode != "float32":
+            n_candidates = min(self.size, k * self.rerank_factor)
+        candidates = np.argpartition(distances, n_candidates - 1)[:n_candidates]
+
+        if n_candidates > k:
+            # Sorted indices keep the memory-mapped reads sequential.
+            candidates = np.sort(candidates)
+            exact = self._full_vectors()[candidates]
+            distances = np.sum((exact - query) ** 2, axis=1)
+        else:
+            distances = distances[candidates]
+
+        order = np.argsort(distances)[:k]
+        return candidates[order], distances[order]
+
+    def search(self, query_embedding, k: int = 5, rerank: bool = True):
+        """
+        Return the k nearest chunks to a query embedding.
+
+        Args:
+            query_embedding: The query vector (list or NumPy array).
+            k (int): Number of results to return.
+            rerank (bool): Re-rank coarse candidates against the full-precision vectors.
+
+        Returns:
+            list[tuple[Document, float]]: (chunk, distance) pairs, closest first.
+        """
+        rows, distances = self.search_ids(query_embedding, k=k, rerank=rerank)
+        hits = []
+        for row, distance in zip(rows, distances):
+            _id, document, metadata = self.record(row)
+            hits.append((Document(page_content=document, metadata=metadata), float(distance)))
+        return hits
+
+    def recall_at_k(self, queries: np.ndarray, k: int = 10, rerank: bool = True) -> float:
+        """
+        Fraction of the exact top-k neighbours returned by search, averaged over queries.
+        """
+        vectors = self._full_vectors()
+        hits = 0
+        for query in np.asarray(queries, dtype=np.float32):
+            exact = np.argpartition(np.sum((vectors - query) ** 2, axis=1), k - 1)[:k]
+            found, _ = self.search_ids(query, k=k, rerank=rerank)
+            hits += len(np.intersect1d(exact, found))
+        return hits / (len(queries) * k)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self._full_vectors())
+        np.save(os.path.join(path, "codes.npy"), self.codes)
+        for name, value in self.params.items():
+            np.save(os.path.join(path, f"{name}.npy"), value)
+        offsets = np.empty(self.size + 1, dtype=np.int64)
+        offsets[0] = 0
+        with open(os.path.join(path, "records.bin"), "wb") as f:
+            for row in range(self.size):
+                offsets[row + 1] = offsets[row] + f.write(json.dumps(self.record(row)).encode("utf-8"))
+        np.save(os.path.join(path, "record_offsets.npy"), offsets)
+        with open(os.path.join(path, "store.json"), "w") as f:
+            json.dump({"mode": self.mode,
+                       "pq_subspaces": self.pq_subspaces,
+                       "pq_centroids": self.pq_centroids,
+                       "rerank_factor": self.rerank_factor,
+                       "params": sorted(self.params)}, f)
+        self.path = path
+        logger.info(f"Saved {self.mode} store with {self.size} vectors to {path}")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False):
+        """
+        Load a saved store. Full-precision vectors and chunk records are always
+        memory-mapped, so every file of the store is open once load returns and the
+        store keeps working even if its directory is deleted afterwards (POSIX).
+
+        Args:
+            path (str): Directory written by save().
+            mmap (bool): Memory-map the codes too instead of reading them into RAM, so
+                opening the store takes the same time whatever the corpus size.
+        """
+        with open(os.path.join(path, "store.json")) as f:
+            settings = json.load(f)
+        store = cls(mode=settings["mode"],
+                    pq_subspaces=settings["pq_subspaces"],
+                    pq_centroids=settings["pq_centroids"],
+                    rerank_factor=settings["rerank_factor"])
+        store.path = path
+        mmap_mode = "r" if mmap else None
+        store.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode=mmap_mode)
+        store.params = {name: np.load(os.path.join(path, f"{name}.npy")) for name in settings["params"]}
+        store._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        store._record_offsets = np.load(os.path.join(path, "record_offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(path, "records.bin")
+        # np.memmap cannot map an empty file.
+        store._record_blob = np.memmap(blob_path, dtype=np.uint8, mode="r") \
+            if os.path.getsize(blob_path) else b""
+        return store
+
+
+def holdout_queries(vectors: np.ndarray, n_queries: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Split stored vectors into (indexed, queries) for evaluate_modes.
+
+    A query that is also indexed finds itself at distance 0 in every mode, which
+    inflates recall, so the sampled queries are left out of the indexed vectors.
+    """
+    if not 0 < n_queries < len(vectors):
+        raise ValueError(f"n_queries must be between 1 and {len(vectors) - 1}, got {n_queries}")
+    rows = np.random.default_rng(seed).permutation(len(vectors))
+    return vectors[np.sort(rows[n_queries:])], vectors[rows[:n_queries]]
+
+
+def evaluate_modes(embeddings: np.ndarray, queries: np.ndarray, k: int = 10, modes=MODES, **kwargs):
+    """
+    Build a store per mode over the same vectors and report its size and recall@k.
+    Queries should not be among the embeddings (see holdout_queries).
+
+    Returns:
+        dict[str, dict]: Mode to {"bytes": size of the codes, "recall@k": recall with re-ranking,
+        "recall@k_coarse": recall of the compressed codes alone}.
+    """
+    placeholders = [""] * len(embeddings)
+    report = {}
+    for mode in modes:
+        store = CompactVectorStore(mode=mode, **kwargs).build(
+            [str(i) for i in range(len(embeddings))], embeddings, placeholders, [{}] * len(embeddings))
+        report[mode] = {"bytes": int(store.codes.nbytes),
+                        "recall@k": store.recall_at_k(queries, k=k),
+                        "recall@k_coarse": store.recall_at_k(queries, k=k, rerank=False)}
+        logger.info(f"{mode}: {report[mode]['bytes'] / 2**20:.1f} MiB, "
+                    f"recall@{k}={report[mode]['recall@k']:.3f} "
+                    f"(coarse {report[mode]['recall@k_coarse']:.3f})")
+    return report
+
+
+def main():
+    import yaml
+    from .vector_db import VectorDB
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export the Chroma store to a compact quantized store.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--chroma-path", default=os.environ.get("CHROMA_PATH"))
+    parser.add_argument("--store-path", default=os.environ.get("COMPACT_STORE_PATH"))
+    parser.add_argument("--mode", choices=MODES, help="Overrides compact_store.mode from the config.")
+    parser.add_argument("--evaluate-queries", type=int, default=0,
+                        help="Report recall@k per mode, holding this many stored vectors out of the "
+                             "index to use as queries.")
+    parser.add_argument("--queries-file",
+                        help="Report recall@k per mode for real query embeddings saved as a .npy array.")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    store = CompactVectorStore.from_config(config)
+    if args.mode:
+        store.mode = args.mode
+    store = VectorDB(embedder=None, chroma_path=args.chroma_path).export_compact(args.store_path, store=store)
+
+    settings = {key: value for key, value in config.get("compact_store", {}).items() if key != "mode"}
+    if args.queries_file:
+        evaluate_modes(store._full_vectors(), np.load(args.queries_file), k=args.k, **settings)
+    elif args.evaluate_queries:
+        vectors, queries = holdout_queries(store._full_vectors(), args.evaluate_queries)
+        evaluate_modes(vectors, queries, k=args.k, **settings)
+
+
+if __name__ == "__main__":
+    main()
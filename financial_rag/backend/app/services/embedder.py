@@ -1,5 +1,6 @@
 from models.model_loader import ModelLoader
 from tqdm import tqdm
+import numpy as np
 
 class Embedder:
     """
@@ -10,10 +11,13 @@ class Embedder:
        - Creates a ModelLoader instance with the provided configuration.
        - Loads the embedding model using the ModelLoader.
 
-    2. embed_documents method:
+    2. embed_array method:
        - Takes a list of documents as input.
-       - Iterates through each document, generating an embedding using the loaded model.
-       - Returns a list of embeddings corresponding to the input documents.
+       - Iterates through each document, writing its embedding into one preallocated
+         float32 array of shape (len(documents), embedding_dimension).
+
+    3. embed_documents method:
+       - Same as embed_array, converted to nested lists for Chroma, which only accepts lists.
 
     This class serves as a wrapper around the ModelLoader, providing a simple interface
     for embedding multiple documents. It's designed to work with the financial BERT model
@@ -22,8 +26,14 @@ class Embedder:
     def __init__(self, config):
         self.model_loader = ModelLoader(**config)
         self.model_loader.load_embedding_model()
+        self.dimension = config['embedding_dimension']
 
-    def embed_documents(self, documents):
-        output = [list(self.model_loader.get_embeddings(doc).astype(float)) for doc in tqdm(documents)]
+    def embed_array(self, documents):
+        output = np.empty((len(documents), self.dimension), dtype=np.float32)
+        for i, doc in enumerate(tqdm(documents)):
+            output[i] = self.model_loader.get_embeddings(doc)
 
         return output
+
+    def embed_documents(self, documents):
+        return self.embed_array(documents).tolist()
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import argparse
+import logging
+import threading
+
+from .compact_store import CompactVectorStore
+
+from dotenv import load_dotenv
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+POINTER_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+STAGING_PREFIX = ".staging-"
+RETIRED_DIR = "retired"
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # Some filesystems do not support fsync on directories.
+    finally:
+        os.close(fd)
+
+
+def _fsync_tree(path: str):
+    for dir_path, _dirs, files in os.walk(path):
+        for name in files:
+            with open(os.path.join(dir_path, name), "rb") as f:
+                os.fsync(f.fileno())
+        _fsync_dir(dir_path)
+
+
+class SnapshotManager:
+    """
+    SnapshotManager publishes immutable, versioned index snapshots under a root directory.
+
+    Layout:
+        <root>/versions/<version>/     one immutable snapshot per version
+        <root>/versions/.staging-*/    snapshots still being written
+        <root>/CURRENT                 name of the version being served
+        <root>/retired/<version>       when a version stopped being current
+
+    Key components:
+    1. publish:
+       - Builds a snapshot into a staging directory, fsyncs it, renames it into
+         versions/ and then atomically replaces the CURRENT pointer (os.replace).
+       - A crash at any point leaves the previous version live and at most a stale
+         staging directory behind.
+       - Runs gc once the new version is live.
+
+    2. rollback:
+       - Points CURRENT back at an existing version.
+
+    3. gc:
+       - Deletes versions that stopped being current more than the retention period
+         ago (and stale staging directories), always keeping the current version and
+         the `keep` newest ones.
+    """
+    def __init__(self,
+                 root: str,
+                 retention_seconds: float = 7 * 24 * 3600,
+                 keep: int = 2):
+        self.root = root
+        self.versions_path = os.path.join(root, "versions")
+        self.retired_path = os.path.join(root, RETIRED_DIR)
+        self.retention_seconds = retention_seconds
+        self.keep = keep
+        os.makedirs(self.versions_path, exist_ok=True)
+        os.makedirs(self.retired_path, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, root: str, config: dict):
+        settings = config.get("snapshots", {})
+        return cls(root,
+                   retention_seconds=settings.get("retention_hours", 168) * 3600,
+                   keep=settings.get("keep", 2))
+
+    def version_path(self, version: str) -> str:
+        return os.path.join(self.versions_path, version)
+
+    def list_versions(self) -> list[str]:
+        # Version names are fixed-width UTC timestamps with nanoseconds, so lexical
+        # order is publish order.
+        return sorted(d for d in os.listdir(self.versions_path)
+                      if not d.startswith(STAGING_PREFIX)
+                      and os.path.isdir(self.version_path(d)))
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, POINTER_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current_path(self):
+        version = self.current_version()
+        return self.version_path(version) if version else None
+
+    def retired_at(self, name: str) -> float:
+        """
+        Time a version stopped being current. Staging directories and versions retired
+        before this was recorded fall back to their modification time.
+        """
+        try:
+            with open(os.path.join(self.retired_path, name)) as f:
+                return float(f.read())
+        except (FileNotFoundError, ValueError):
+            return os.path.getmtime(self.version_path(name))
+
+    def _swap_pointer(self, version: str):
+        previous = self.current_version()
+        tmp_path = os.path.join(self.root, f"{POINTER_FILE}.tmp-{uuid.uuid4().hex}")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.root, POINTER_FILE))
+        _fsync_dir(self.root)
+
+        # Retention counts from here, not from when the version was built, so a version
+        # that was rolled back to is kept for the full period after it is replaced again.
+        try:
+            os.remove(os.path.join(self.retired_path, version))
+        except FileNotFoundError:
+            pass
+        if previous and previous != version:
+            retired_tmp = os.path.join(self.retired_path, f".{previous}.tmp")
+            with open(retired_tmp, "w") as f:
+                f.write(repr(time.time()))
+            os.replace(retired_tmp, os.path.join(self.retired_path, previous))
+
+    def publish(self, build, metadata: dict = None) -> str:
+        """
+        Build a new snapshot and make it the current version.
+
+        Args:
+            build (callable): Called with an empty directory path to write the snapshot into.
+            metadata (dict, optional): Extra fields stored in the snapshot's manifest.
+
+        Returns:
+            str: The published version name.
+        """
+        ns = time.time_ns()
+        version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(ns // 10**9))}.{ns % 10**9:09d}Z"
+        staging_path = os.path.join(self.versions_path, f"{STAGING_PREFIX}{version}")
+        os.makedirs(staging_path)
+        try:
+            build(staging_path)
+            with open(os.path.join(staging_path, MANIFEST_FILE), "w") as f:
+                json.dump(dict(metadata or {}, version=version, created_at=time.time()), f)
+            _fsync_tree(staging_path)
+            os.rename(staging_path, self.version_path(version))
+            _fsync_dir(self.versions_path)
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+
+        self._swap_pointer(version)
+        logger.info(f"Published snapshot {version}")
+        try:
+            self.gc()
+        except OSError as e:
+            # The new version is already live; a failed cleanup is retried on the next publish.
+            logger.error(f"Snapshot garbage collection failed: {str(e)}")
+        return version
+
+    def rollback(self, version: str):
+        if not os.path.isdir(self.version_path(version)):
+            raise ValueError(f"Unknown snapshot version: {version}")
+        self._swap_pointer(version)
+        logger.info(f"Rolled back to snapshot {version}")
+
+    def gc(self) -> list[str]:
+        """
+        Delete expired snapshots and stale staging directories.
+
+        A HotSwapIndex still serving a deleted version keeps working until it swaps:
+        CompactVectorStore.load maps every file of the store, and on POSIX mapped files
+        stay readable after they are unlinked.
+
+        Returns:
+            list[str]: Names of the removed directories.
+        """
+        now = time.time()
+        current = self.current_version()
+        protected = set(self.list_versions()[-self.keep:]) if self.keep else set()
+        protected.add(current)
+        removed = []
+        for name in os.listdir(self.versions_path):
+            path = self.version_path(name)
+            if name in protected or now - self.retired_at(name) < self.retention_seconds:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.remove(os.path.join(self.retired_path, name))
+            except FileNotFoundError:
+                pass
+            removed.append(name)
+        if removed:
+            logger.info(f"Garbage-collected snapshots: {removed}")
+        return removed
+
+
+class HotSwapIndex:
+    """
+    HotSwapIndex serves searches from the current snapshot and hot-reloads newer ones.
+
+    Snapshots are opened with CompactVectorStore.load(mmap=True), so opening one only
+    maps files rather than reading them. A reload builds the new store first and then
+    swaps a single reference; searches already running keep using the store they
+    started with, so no query is dropped during the swap.
+    """
+    def __init__(self,
+                 manager: SnapshotManager,
+                 store_dir: str = "compact",
+                 loader=None):
+        self.manager = manager
+        self.store_dir = store_dir
+        self.loader = loader or (lambda path: CompactVectorStore.load(path, mmap=True))
+        self._current = (None, None)
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.refresh()
+
+    @property
+    def version(self):
+        return self._current[0]
+
+    def refresh(self) -> bool:
+        """
+        Load the snapshot CURRENT points at if it differs from the one being served.
+
+        Returns:
+            bool: True if a new snapshot was swapped in.
+        """
+        with self._reload_lock:
+            version = self.manager.current_version()
+            if version is None or version == self._current[0]:
+                return False
+            start = time.perf_counter()
+            store = self.loader(os.path.join(self.manager.version_path(version), self.store_dir))
+            self._current = (version, store)
+            logger.info(f"Serving snapshot {version} (opened in {(time.perf_counter() - start) * 1000:.1f} ms)")
+            return True
+
+    def search(self, query_embedding, k: int = 5):
+        _version, store = self._current
+        if store is None:
+            return []
+        return store.search(query_embedding, k=k)
+
+    def watch(self, poll_interval: float = 10.0):
+        """
+        Poll the CURRENT pointer in a background thread and reload on change.
+        """
+        def poll():
+            while not self._stop.wait(poll_interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Failed to reload snapshot: {str(e)}")
+
+        self._watcher = threading.Thread(target=poll, daemon=True)
+        self._watcher.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+
+
+def main():
+    import yaml
+    from .embedder import Embedder
+    from .load_documents import load_documents
+    from .vector_db import VectorDB
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Publish and maintain versioned index snapshots.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--snapshots-path", default=os.environ.get("SNAPSHOTS_PATH"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    publish = subparsers.add_parser("publish", help="Re-index DATA_PATH into a new snapshot and make it current.")
+    publish.add_argument("--data-path", default=os.environ.get("DATA_PATH"))
+    subparsers.add_parser("gc", help="Delete expired snapshots.")
+    rollback = subparsers.add_parser("rollback", help="Point CURRENT at an existing snapshot.")
+    rollback.add_argument("version")
+    subparsers.add_parser("list", help="List snapshot versions, marking the current one.")
+
+    args = parser.parse_args()
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    manager = SnapshotManager.from_config(args.snapshots_path, config)
+
+    if args.command == "publish":
+        vector_db = VectorDB(embedder=Embedder(config))
+        chunks = vector_db.split_documents(load_documents(DATA_PATH=args.data_path))
+        vector_db.publish_snapshot(chunks, manager, store=CompactVectorStore.from_config(config))
+    elif args.command == "gc":
+        manager.gc()
+    elif args.command == "rollback":
+        manager.rollback(args.version)
+    elif args.command == "list":
+        current = manager.current_version()
+        for version in manager.list_versions():
+            print(f"{'*' if version == current else ' '} {version}")
+
+
+if __name__ == "__main__":
+    main()
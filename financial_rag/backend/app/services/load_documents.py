@@ -10,6 +10,20 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+def tag_documents(docs, dir_path, DATA_PATH):
+    """
+    Attach sector and company metadata to documents based on the directory layout
+    written by the report scraper (<reports folder>/<sector>/<company>/<file>).
+    """
+    parts = os.path.relpath(dir_path, DATA_PATH).split(os.sep)
+    if len(parts) < 2:
+        return docs
+    sector, company = parts[-2], parts[-1]
+    for doc in docs:
+        doc.metadata.setdefault("sector", sector)
+        doc.metadata.setdefault("company", company)
+    return docs
+
 def load_documents(DATA_PATH):
     documents = []
     
@@ -30,7 +44,7 @@ def load_documents(DATA_PATH):
             document_loader = PyPDFDirectoryLoader(dir_path)
             try:
                 # Try to load the documents and append to the documents list
-                loaded_docs = document_loader.load()
+                loaded_docs = tag_documents(document_loader.load(), dir_path, DATA_PATH)
                 documents.extend(loaded_docs)
                 logging.info(f"Successfully loaded {len(loaded_docs)} documents from PDFs in {dir_path}.")
             except PdfStreamError as e:
@@ -42,7 +56,7 @@ def load_documents(DATA_PATH):
         for txt_file in txt_files:
             try:
                 loader = TextLoader(os.path.join(dir_path, txt_file))
-                loaded_docs = loader.load()
+                loaded_docs = tag_documents(loader.load(), dir_path, DATA_PATH)
                 documents.extend(loaded_docs)
                 logging.info(f"Successfully loaded {len(loaded_docs)} documents from TXT file {txt_file}.")
             except Exception as e:
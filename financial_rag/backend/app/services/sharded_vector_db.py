@@ -0,0 +1,315 @@
+import os
+import re
+import heapq
+import shutil
+import hashlib
+import argparse
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from langchain_community.vectorstores.chroma import Chroma
+from langchain.schema import Document
+
+from .vector_db import VectorDB
+
+from dotenv import load_dotenv
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+PARTITIONS = ("company", "sector", "hash")
+COPY_BATCH_SIZE = 1000
+
+
+def shard_name(metadata: dict, partition_by: str, num_shards: int) -> str:
+    """
+    Map a chunk's metadata to the name of the shard it belongs to.
+
+    Chunks are assigned by source file for the "hash" partition so that every
+    page of a report lands in the same shard and chunk IDs stay stable.
+    """
+    if partition_by == "hash":
+        source = str(metadata.get("source", ""))
+        bucket = int(hashlib.md5(source.encode("utf-8")).hexdigest(), 16) % num_shards
+        return f"shard_{bucket:03d}"
+    key = metadata.get(partition_by) or "unassigned"
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", key).strip("_").lower() or "unassigned"
+
+
+def _init_worker(threads_per_worker: int):
+    # Keep torch from oversubscribing the cores when several workers embed at once.
+    import torch
+    torch.set_num_threads(threads_per_worker)
+
+
+def _build_shard(config: dict, shard_path: str, chunks: list[Document]) -> tuple[str, int]:
+    # Runs in a worker process: each worker loads its own copy of the embedding model.
+    from .embedder import Embedder
+
+    vector_db = VectorDB(embedder=Embedder(config=config))
+    vector_db.add_to_chroma(chunks=chunks, chroma_path=shard_path)
+    return shard_path, len(chunks)
+
+
+class ShardedVectorDB:
+    """
+    ShardedVectorDB partitions the corpus into independent Chroma stores and routes queries across them.
+
+    Key components:
+    1. partition:
+       - Assigns each chunk to a shard by company, sector or a hash of its source file.
+
+    2. build:
+       - Embeds and writes shards in parallel worker processes.
+       - With node_index/num_nodes, a machine only builds its own slice of the shards,
+         so several machines sharing a filesystem can ingest into the same shards_path.
+
+    3. search:
+       - Fans a top-k query out to every shard concurrently and merges the results by distance.
+       - Runs in the calling process: every shard it searches is opened there, so all of
+         them must fit in one machine's memory. Extra nodes only speed up ingest; to spread
+         query load, run a router per node over a subset of the shards (the `shards` argument).
+
+    4. merge_shards / rebalance:
+       - Copy stored embeddings between shards without re-embedding, either to merge
+         shards together or to repartition the whole corpus.
+
+    Every sub-directory of shards_path is one shard, so no shared manifest has to be
+    coordinated between workers or machines.
+    """
+    def __init__(self,
+                 config: dict,
+                 shards_path: str,
+                 embedder=None):
+        sharding = config.get("sharding", {})
+        self.config = config
+        self.shards_path = shards_path
+        self.embedder = embedder
+        self.partition_by = sharding.get("partition_by", "company")
+        self.num_shards = sharding.get("num_shards", 8)
+        self.workers = sharding.get("workers") or os.cpu_count()
+        self._shards = {}
+        self._shards_lock = threading.Lock()
+        # One long-lived pool bounds the number of concurrent shard searches.
+        self._search_pool = ThreadPoolExecutor(max_workers=self.workers)
+
+        if self.partition_by not in PARTITIONS:
+            raise ValueError(f"partition_by must be one of {PARTITIONS}, got {self.partition_by!r}")
+
+    def shard_names(self) -> list[str]:
+        if not os.path.isdir(self.shards_path):
+            return []
+        return sorted(d for d in os.listdir(self.shards_path)
+                      if os.path.isdir(os.path.join(self.shards_path, d)))
+
+    def partition(self, chunks: list[Document]) -> dict[str, list[Document]]:
+        """
+        Group chunks by shard, preserving their original order within each shard.
+
+        Args:
+            chunks (list[Document]): Chunks to assign.
+
+        Returns:
+            dict[str, list[Document]]: Shard name to the chunks it should hold.
+        """
+        shards = {}
+        for chunk in chunks:
+            name = shard_name(chunk.metadata, self.partition_by, self.num_shards)
+            shards.setdefault(name, []).append(chunk)
+        logger.info(f"Partitioned {len(chunks)} chunks into {len(shards)} shards by {self.partition_by}")
+        return shards
+
+    def build(self,
+              chunks: list[Document],
+              node_index: int = 0,
+              num_nodes: int = 1):
+        """
+        Embed and store chunks into their shards using a pool of worker processes.
+
+        Args:
+            chunks (list[Document]): Chunks to ingest.
+            node_index (int): Index of this machine among the ingesting nodes.
+            num_nodes (int): Total number of ingesting nodes sharing shards_path.
+        """
+        shards = self.partition(chunks)
+        assigned = {name: shard_chunks for i, (name, shard_chunks) in enumerate(sorted(shards.items()))
+                    if i % num_nodes == node_index}
+        if not assigned:
+            logger.info("✅ No shards assigned to this node")
+            return
+
+        os.makedirs(self.shards_path, exist_ok=True)
+        workers = min(self.workers, len(assigned))
+        threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        logger.info(f"Building {len(assigned)} shards with {workers} workers")
+
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker,
+                                 initargs=(threads_per_worker,)) as pool:
+            futures = [pool.submit(_build_shard,
+                                   self.config,
+                                   os.path.join(self.shards_path, name),
+                                   shard_chunks)
+                       for name, shard_chunks in assigned.items()]
+            for future in as_completed(futures):
+                shard_path, count = future.result()
+                logger.info(f"Shard {shard_path} ingested {count} chunks")
+
+        with self._shards_lock:
+            self._shards.clear()
+
+    def _open_shard(self, name: str) -> VectorDB:
+        # Search threads call this concurrently; the lock keeps a shard from being opened twice.
+        with self._shards_lock:
+            if name not in self._shards:
+                self._shards[name] = VectorDB(embedder=self.embedder,
+                                              chroma_path=os.path.join(self.shards_path, name))
+            return self._shards[name]
+
+    def search(self, query_embedding, k: int = 5, shards: list[str] = None):
+        """
+        Fan a top-k search out to the shards concurrently and merge the results.
+
+        Args:
+            query_embedding: The query vector (list or NumPy array).
+            k (int): Number of results to return overall.
+            shards (list[str], optional): Restrict the search to these shards.
+
+        Returns:
+            list[tuple[Document, float]]: (chunk, distance) pairs, closest first.
+        """
+        names = shards if shards is not None else self.shard_names()
+        if not names:
+            return []
+        query_embedding = [float(x) for x in query_embedding]
+
+        results = self._search_pool.map(lambda name: self._open_shard(name).search(query_embedding, k=k), names)
+        merged = [hit for shard_hits in results for hit in shard_hits]
+
+        return heapq.nsmallest(k, merged, key=lambda hit: hit[1])
+
+    def close(self):
+        self._search_pool.shutdown(wait=False)
+
+    def _iter_shard(self, name: str):
+        # Yield stored records in batches so large shards are never fully in memory.
+        store = Chroma(persist_directory=os.path.join(self.shards_path, name))
+        offset = 0
+        while True:
+            batch = store.get(include=["embeddings", "documents", "metadatas"],
+                              limit=COPY_BATCH_SIZE,
+                              offset=offset)
+            if not batch["ids"]:
+                break
+            yield batch
+            offset += len(batch["ids"])
+
+    def _write_records(self, target_path: str, records: dict):
+        store = Chroma(persist_directory=target_path)
+        store._collection.upsert(ids=records["ids"],
+                                 embeddings=records["embeddings"],
+                                 metadatas=records["metadatas"],
+                                 documents=records["documents"])
+
+    def merge_shards(self, sources: list[str], target: str, remove_sources: bool = False):
+        """
+        Merge several shards into one, reusing the stored embeddings.
+
+        Args:
+            sources (list[str]): Names of the shards to merge.
+            target (str): Name of the resulting shard (may be one of the sources).
+            remove_sources (bool): Delete the source shards once merged.
+        """
+        target_path = os.path.join(self.shards_path, target)
+        for name in sources:
+            if name == target:
+                continue
+            for batch in self._iter_shard(name):
+                self._write_records(target_path, batch)
+            logger.info(f"Merged shard {name} into {target}")
+            if remove_sources:
+                shutil.rmtree(os.path.join(self.shards_path, name))
+        with self._shards_lock:
+            self._shards.clear()
+
+    def rebalance(self, target_path: str, partition_by: str = None, num_shards: int = None):
+        """
+        Repartition every stored chunk into a fresh set of shards at target_path.
+
+        The existing shards are left untouched so queries can keep being served
+        from them until the new layout is pointed at.
+
+        Args:
+            target_path (str): Directory for the new shard set.
+            partition_by (str, optional): New partition scheme, defaults to the current one.
+            num_shards (int, optional): New number of hash shards, defaults to the current one.
+
+        Returns:
+            ShardedVectorDB: A router over the new shard set.
+        """
+        partition_by = partition_by or self.partition_by
+        num_shards = num_shards or self.num_shards
+        for name in self.shard_names():
+            for batch in self._iter_shard(name):
+                grouped = {}
+                for i, metadata in enumerate(batch["metadatas"]):
+                    new_name = shard_name(metadata, partition_by, num_shards)
+                    records = grouped.setdefault(new_name, {"ids": [], "embeddings": [],
+                                                            "metadatas": [], "documents": []})
+                    for field in records:
+                        records[field].append(batch[field][i])
+                for new_name, records in grouped.items():
+                    self._write_records(os.path.join(target_path, new_name), records)
+            logger.info(f"Rebalanced shard {name}")
+
+        config = dict(self.config)
+        config["sharding"] = dict(config.get("sharding", {}),
+                                  partition_by=partition_by,
+                                  num_shards=num_shards)
+        return ShardedVectorDB(config, target_path, embedder=self.embedder)
+
+
+def main():
+    import yaml
+    from .load_documents import load_documents
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build and maintain sharded vector stores.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--shards-path", default=os.environ.get("SHARDS_PATH"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Ingest DATA_PATH into shards.")
+    build.add_argument("--data-path", default=os.environ.get("DATA_PATH"))
+    build.add_argument("--node-index", type=int, default=0)
+    build.add_argument("--num-nodes", type=int, default=1)
+
+    merge = subparsers.add_parser("merge", help="Merge shards into one.")
+    merge.add_argument("target")
+    merge.add_argument("sources", nargs="+")
+    merge.add_argument("--remove-sources", action="store_true")
+
+    rebalance = subparsers.add_parser("rebalance", help="Repartition shards into a new directory.")
+    rebalance.add_argument("target_path")
+    rebalance.add_argument("--partition-by", choices=PARTITIONS)
+    rebalance.add_argument("--num-shards", type=int)
+
+    args = parser.parse_args()
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    sharded_db = ShardedVectorDB(config, args.shards_path)
+
+    if args.command == "build":
+        documents = load_documents(DATA_PATH=args.data_path)
+        chunks = VectorDB(embedder=None).split_documents(documents)
+        sharded_db.build(chunks, node_index=args.node_index, num_nodes=args.num_nodes)
+    elif args.command == "merge":
+        sharded_db.merge_shards(args.sources, args.target, remove_sources=args.remove_sources)
+    elif args.command == "rebalance":
+        sharded_db.rebalance(args.target_path, args.partition_by, args.num_shards)
+
+
+if __name__ == "__main__":
+    main()
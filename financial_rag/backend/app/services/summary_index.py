@@ -0,0 +1,320 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_community.vectorstores.chroma import Chroma
+from langchain.schema import Document
+
+from dotenv import load_dotenv
+
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Bump when the prompts change so cached summaries are regenerated.
+PROMPT_VERSION = "1"
+BROAD_LEVELS = ["company_quarter", "sector_quarter"]
+SHORT_PAGE_CHARS = 300
+
+LEVEL_PROMPTS = {
+    "page": "Summarize this page of a financial report. Keep every figure, period and segment name.",
+    "section": "Combine these page summaries from one section of a financial report into one summary.",
+    "report": "Combine these section summaries into a summary of the whole report: headline results, "
+              "growth, segments, cash flow, guidance and notable events.",
+    "company_quarter": "Combine these report summaries into a summary of the company's performance "
+                       "for the period, with the key figures and their changes.",
+    "sector_quarter": "Combine these company summaries into a summary of the sector for the period. "
+                      "Rank the companies by performance and state the key figures behind the ranking.",
+}
+
+QUARTER_PATTERNS = (
+    (re.compile(r"([1-4])(?:st|nd|rd|th)[ _-]?(?:qtr|quarter)[ _-]?(\d{2,4})", re.I), "quarter_year"),
+    (re.compile(r"q([1-4])[ _-]?((?:19|20)?\d{2})(?!\d)", re.I), "quarter_year"),
+    (re.compile(r"((?:19|20)\d{2})[ _-]?q([1-4])", re.I), "year_quarter"),
+)
+YEAR_PATTERN = re.compile(r"(?:19|20)\d{2}")
+LATEST_QUARTER_PATTERN = re.compile(r"\b(last|this|latest|most recent|previous|past|current) quarter\b", re.I)
+
+
+def parse_period(text: str):
+    """
+    Find a reporting period in text, e.g. "2024-Q1" or "2024-FY", or None.
+    """
+    for pattern, order in QUARTER_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            quarter, year = match.groups() if order == "quarter_year" else match.groups()[::-1]
+            year = f"20{year}" if len(year) == 2 else year
+            return f"{year}-Q{quarter}"
+    match = YEAR_PATTERN.search(text)
+    return f"{match.group(0)}-FY" if match else None
+
+
+def report_period(source: str) -> str:
+    """
+    Infer the reporting period of a report from its file name, e.g. "2024-Q1" or "2024-FY".
+    """
+    return parse_period(os.path.basename(str(source))) or "unknown"
+
+
+def query_periods(query: str, known_periods) -> list[str]:
+    """
+    Map the period a question asks about to summary `period` values.
+
+    "Q2 2024" selects that quarter, a bare year selects every period of that year,
+    and "last quarter" / "this quarter" select the latest quarter in known_periods.
+
+    Args:
+        query (str): The user's question.
+        known_periods: The periods present in the summary store.
+
+    Returns:
+        list[str]: Periods to restrict the search to; empty if the question names none.
+    """
+    period = parse_period(query)
+    if period and period.endswith("-FY"):
+        year = period.split("-")[0]
+        return sorted(p for p in known_periods if p.startswith(f"{year}-")) or [period]
+    if period:
+        return [period]
+    if LATEST_QUARTER_PATTERN.search(query):
+        quarters = sorted(p for p in known_periods if "-Q" in p)
+        return quarters[-1:]
+    return []
+
+
+class SummaryIndexBuilder:
+    """
+    SummaryIndexBuilder precomputes a hierarchy of summaries for broad, cross-document questions.
+
+    Levels, each summarizing the one below:
+        page -> section (section_pages consecutive pages) -> report
+             -> company_quarter (a company's reports for one period)
+             -> sector_quarter (a sector's companies for one period)
+
+    Every summary is cached by a hash of its level, prompt version, scope and input text, so
+    re-running the build only calls the LLM for pages that changed and for the summaries
+    above them; cache entries a build no longer uses are dropped. Every summary is cut to
+    max_words, which bounds the prompt size of broad queries. Summaries are stored in their own Chroma directory with level, sector,
+    company and period metadata, keyed by scope so a changed summary replaces the old one.
+    """
+    def __init__(self,
+                 model_loader,
+                 embedder,
+                 summary_path: str,
+                 section_pages: int = 10,
+                 max_words: int = 200,
+                 workers: int = 8):
+        self.model_loader = model_loader
+        self.embedder = embedder
+        self.summary_path = summary_path
+        self.section_pages = section_pages
+        self.max_words = max_words
+        self.workers = workers
+        self.cache_path = os.path.join(summary_path, "summary_cache.json")
+        self._cache_lock = threading.Lock()
+        self.cache = self._load_cache()
+        self.llm_calls = 0
+        self._used_keys = set()
+
+    @classmethod
+    def from_config(cls, model_loader, embedder, summary_path: str, config: dict):
+        settings = config.get("summaries", {})
+        return cls(model_loader,
+                   embedder,
+                   summary_path,
+                   section_pages=settings.get("section_pages", 10),
+                   max_words=settings.get("max_words", 200),
+                   workers=settings.get("workers", 8))
+
+    def _load_cache(self) -> dict:
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_cache(self):
+        os.makedirs(self.summary_path, exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with self._cache_lock, open(tmp_path, "w") as f:
+            json.dump(self.cache, f)
+        os.replace(tmp_path, self.cache_path)
+
+    def _truncate(self, text: str) -> str:
+        words = text.split()
+        if len(words) <= self.max_words:
+            return text
+        return " ".join(words[:self.max_words])
+
+    def _summarize(self, level: str, texts: list[str], scope: str) -> str:
+        text = "\n\n---\n\n".join(texts)
+        if level == "page" and len(text) < SHORT_PAGE_CHARS:
+            return self._truncate(text)
+        key = hashlib.sha256(f"{PROMPT_VERSION}\n{level}\n{scope}\n{text}".encode("utf-8")).hexdigest()
+        with self._cache_lock:
+            self._used_keys.add(key)
+            if key in self.cache:
+                return self._truncate(self.cache[key])
+
+        messages = [
+            {"role": "system", "content": f"{LEVEL_PROMPTS[level]} Use at most {self.max_words} words."},
+            {"role": "user", "content": f"{scope}\n\n{text}"}
+        ]
+        # The prompt asks for max_words, but only truncation guarantees it.
+        summary = self._truncate(self.model_loader.query_openai(messages))
+        with self._cache_lock:
+            self.cache[key] = summary
+            self.llm_calls += 1
+        return summary
+
+    def _summarize_groups(self, level: str, groups: dict) -> dict:
+        # groups maps a scope key to (scope description, input texts); runs concurrently.
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {key: pool.submit(self._summarize, level, texts, scope)
+                       for key, (scope, texts) in groups.items()}
+            return {key: future.result() for key, future in futures.items()}
+
+    def build(self, documents: list[Document]) -> list[Document]:
+        """
+        Summarize page-level documents into every level of the hierarchy.
+
+        Args:
+            documents (list[Document]): Pages as returned by load_documents, with
+                'source', 'page', and optionally 'sector'/'company' metadata.
+
+        Returns:
+            list[Document]: One summary document per scope, across all levels.
+        """
+        self._used_keys = set()
+        reports = {}
+        for doc in documents:
+            reports.setdefault(doc.metadata.get("source"), []).append(doc)
+
+        report_meta, page_groups = {}, {}
+        for source, pages in reports.items():
+            pages.sort(key=lambda d: d.metadata.get("page", 0))
+            meta = pages[0].metadata
+            report_meta[source] = {"sector": meta.get("sector", "unknown"),
+                                   "company": meta.get("company", "unknown"),
+                                   "period": report_period(source)}
+            for page in pages:
+                page_groups[(source, page.metadata.get("page", 0))] = (
+                    f"{report_meta[source]['company']} report {os.path.basename(source)}, "
+                    f"page {page.metadata.get('page', 0)}", [page.page_content])
+
+        summaries = []
+
+        def emit(level, scope_id, text, **metadata):
+            summaries.append(Document(page_content=text, metadata=dict(
+                metadata, level=level, id=f"{level}:{scope_id}")))
+
+        page_summaries = self._summarize_groups("page", page_groups)
+        self._save_cache()
+        for (source, page), text in page_summaries.items():
+            emit("page", f"{source}:{page}", text, source=source, page=page, **report_meta[source])
+
+        section_groups = {}
+        for source, pages in reports.items():
+            keys = [(source, p.metadata.get("page", 0)) for p in pages]
+            for start in range(0, len(keys), self.section_pages):
+                section_keys = keys[start:start + self.section_pages]
+                section_groups[(source, start // self.section_pages)] = (
+                    f"{report_meta[source]['company']} report {os.path.basename(source)}, "
+                    f"pages {section_keys[0][1]}-{section_keys[-1][1]}",
+                    [page_summaries[k] for k in section_keys])
+        section_summaries = self._summarize_groups("section", section_groups)
+        for (source, section), text in section_summaries.items():
+            emit("section", f"{source}:{section}", text, source=source, **report_meta[source])
+
+        report_groups = {}
+        for source in reports:
+            sections = sorted(k for k in section_summaries if k[0] == source)
+            report_groups[source] = (
+                f"{report_meta[source]['company']} report {os.path.basename(source)} "
+                f"({report_meta[source]['period']})",
+                [section_summaries[k] for k in sections])
+        report_summaries = self._summarize_groups("report", report_groups)
+        self._save_cache()
+        for source, text in report_summaries.items():
+            emit("report", source, text, source=source, **report_meta[source])
+
+        company_groups = {}
+        for source in sorted(reports):
+            meta = report_meta[source]
+            key = (meta["sector"], meta["company"], meta["period"])
+            scope, texts = company_groups.setdefault(
+                key, (f"{meta['company']} ({meta['sector']}), period {meta['period']}", []))
+            texts.append(report_summaries[source])
+        company_summaries = self._summarize_groups("company_quarter", company_groups)
+        for (sector, company, period), text in company_summaries.items():
+            emit("company_quarter", f"{company}:{period}", text,
+                 sector=sector, company=company, period=period)
+
+        sector_groups = {}
+        for (sector, company, period) in sorted(company_summaries):
+            scope, texts = sector_groups.setdefault(
+                (sector, period), (f"{sector} sector, period {period}", []))
+            texts.append(f"{company}:\n{company_summaries[(sector, company, period)]}")
+        sector_summaries = self._summarize_groups("sector_quarter", sector_groups)
+        for (sector, period), text in sector_summaries.items():
+            emit("sector_quarter", f"{sector}:{period}", text, sector=sector, period=period)
+
+        pruned = len(self.cache) - len(self._used_keys & self.cache.keys())
+        self.cache = {key: summary for key, summary in self.cache.items() if key in self._used_keys}
+        self._save_cache()
+        logger.info(f"Built {len(summaries)} summaries with {self.llm_calls} LLM calls "
+                    f"({len(self.cache)} cached, {pruned} stale cache entries dropped)")
+        return summaries
+
+    def store(self, summaries: list[Document]):
+        """
+        Upsert summaries into the summary Chroma store, keyed by level and scope.
+        """
+        vector_db = Chroma(
+            persist_directory=self.summary_path,
+            embedding_function=self.embedder
+        )
+        existing_items = vector_db.get(include=["documents"])
+        existing = dict(zip(existing_items["ids"], existing_items["documents"]))
+        new_ids = {summary.metadata["id"] for summary in summaries}
+        stale = [summary_id for summary_id in existing if summary_id not in new_ids]
+        if stale:
+            vector_db.delete(ids=stale)
+
+        # only re-embed summaries whose text changed
+        changed = [summary for summary in summaries
+                   if existing.get(summary.metadata["id"]) != summary.page_content]
+        if changed:
+            vector_db.add_documents(changed, ids=[summary.metadata["id"] for summary in changed])
+        logger.info(f"Stored {len(changed)} new or changed summaries in {self.summary_path}, "
+                    f"removed {len(stale)} stale")
+
+
+def main():
+    import yaml
+    from models.model_loader import ModelLoader
+    from .embedder import Embedder
+    from .load_documents import load_documents
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the hierarchical summary index.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--data-path", default=os.environ.get("DATA_PATH"))
+    parser.add_argument("--summary-path", default=os.environ.get("SUMMARY_CHROMA_PATH"))
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    builder = SummaryIndexBuilder.from_config(ModelLoader(**config), Embedder(config),
+                                              args.summary_path, config)
+    summaries = builder.build(load_documents(DATA_PATH=args.data_path))
+    builder.store(summaries)
+
+
+if __name__ == "__main__":
+    main()
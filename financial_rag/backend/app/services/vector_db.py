@@ -1,12 +1,14 @@
 import os
 import shutil
 import argparse
+import numpy as np
 from tqdm import tqdm
 
 from langchain_community.vectorstores.chroma import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from .embedder import Embedder  # Make sure to import your Embedder class
+from .compact_store import CompactVectorStore
 
 from dotenv import load_dotenv
 import logging
@@ -26,12 +28,18 @@ class VectorDB:
     - Add documents to the Chroma vector store
     - Split documents into smaller chunks
     - Create unique IDs for document chunks
+    - Search the store with a precomputed query embedding, or list stored metadata
+    - Export the stored embeddings to a quantized CompactVectorStore
+    - Publish a full rebuild as a versioned snapshot (see services.index_snapshots)
 
     It uses an Embedder for document embedding and Chroma as the vector store.
     """
     def __init__(self,
-                 embedder):
+                 embedder,
+                 chroma_path: str = None):
         self.embedder = embedder
+        self.chroma_path = chroma_path or os.environ.get("CHROMA_PATH")
+        self.vector_db = None
 
     def add_to_chroma(self,
                       chunks: list[Document],
@@ -70,6 +78,88 @@ class VectorDB:
             logger.info("✅ No new documents to add")
 
         self.vector_db = vector_db
+        self.chroma_path = chroma_path
+
+    def search(self, query_embedding, k: int = 5, filter: dict = None):
+        """
+        Return the k nearest chunks to a query embedding.
+
+        Args:
+            query_embedding: The query vector (list or NumPy array).
+            k (int): Number of results to return.
+            filter (dict, optional): Chroma metadata filter, e.g. {"level": {"$in": [...]}}.
+
+        Returns:
+            list[tuple[Document, float]]: (chunk, distance) pairs, closest first.
+        """
+        if self.vector_db is None:
+            self.vector_db = Chroma(
+                persist_directory=self.chroma_path,
+                embedding_function=self.embedder
+            )
+        return self.vector_db.similarity_search_by_vector_with_relevance_scores(
+            embedding=[float(x) for x in query_embedding],
+            k=k,
+            filter=filter
+        )
+
+    def get_metadatas(self, filter: dict = None) -> list[dict]:
+        """
+        Return the metadata of every stored document matching a Chroma metadata filter.
+        """
+        if self.vector_db is None:
+            self.vector_db = Chroma(
+                persist_directory=self.chroma_path,
+                embedding_function=self.embedder
+            )
+        return self.vector_db.get(where=filter, include=["metadatas"])["metadatas"]
+
+    def export_compact(self,
+                       store_path: str,
+                       store: CompactVectorStore = None,
+                       batch_size: int = 1000):
+        """
+        Export the embeddings already stored in Chroma to a CompactVectorStore.
+
+        Embeddings are copied into one preallocated float32 array, quantized
+        by `store` and saved to `store_path`; nothing is re-embedded.
+
+        Args:
+            store_path (str): Directory to save the compact store to.
+            store (CompactVectorStore, optional): An empty store carrying the quantization
+                settings, e.g. CompactVectorStore.from_config(config). Defaults to int8.
+            batch_size (int): Number of records read from Chroma at a time.
+
+        Returns:
+            CompactVectorStore: The saved store.
+        """
+        vector_db = Chroma(
+            persist_directory=self.chroma_path,
+            embedding_function=self.embedder
+        )
+        count = vector_db._collection.count()
+        embeddings = None
+        ids, documents, metadatas = [], [], []
+
+        for offset in tqdm(range(0, count, batch_size)):
+            batch = vector_db.get(include=["embeddings", "documents", "metadatas"],
+                                  limit=batch_size,
+                                  offset=offset)
+            batch_embeddings = np.asarray(batch["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.empty((count, batch_embeddings.shape[1]), dtype=np.float32)
+            embeddings[len(ids):len(ids) + len(batch_embeddings)] = batch_embeddings
+            ids.extend(batch["ids"])
+            documents.extend(batch["documents"])
+            metadatas.extend(batch["metadatas"])
+
+        if embeddings is None:
+            raise ValueError(f"No embeddings found in {self.chroma_path}")
+
+        store = store or CompactVectorStore()
+        store.build(ids, embeddings[:len(ids)], documents, metadatas)
+        store.save(store_path)
+        return store
 
     def split_documents(self, documents: list[Document]):
         """
@@ -135,6 +225,36 @@ class VectorDB:
 
         return chunks
 
+    def publish_snapshot(self,
+                         chunks: list[Document],
+                         snapshot_manager,
+                         store: CompactVectorStore = None) -> str:
+        """
+        Rebuild the index into a new snapshot and atomically make it current.
+
+        The live index is never modified: a Chroma store and a CompactVectorStore are
+        written into the snapshot's staging directory, and queries switch over only
+        once the snapshot is complete.
+
+        Args:
+            chunks (list[Document]): All document chunks to index.
+            snapshot_manager (SnapshotManager): Manager of the snapshot root.
+            store (CompactVectorStore, optional): An empty store carrying the quantization
+                settings, e.g. CompactVectorStore.from_config(config). Defaults to int8.
+
+        Returns:
+            str: The published version name.
+        """
+        store = store or CompactVectorStore()
+
+        def build(path):
+            chroma_path = os.path.join(path, "chroma")
+            self.save_to_chroma(chunks, chroma_path)
+            snapshot_db = VectorDB(embedder=self.embedder, chroma_path=chroma_path)
+            snapshot_db.export_compact(os.path.join(path, "compact"), store=store)
+
+        return snapshot_manager.publish(build, metadata={"chunks": len(chunks), "mode": store.mode})
+
     def clear_database(self, CHROMA_PATH):
         if os.path.exists(CHROMA_PATH):
             shutil.rmtree(CHROMA_PATH)
@@ -160,9 +280,11 @@ class VectorDB:
             - This method uses the embedding function from the class instance.
         """
         # create a new embeddings DB from the documents
+        chunks_with_ids = self.create_chunk_ids(chunks)
         vector_db = Chroma.from_documents(
-            documents=chunks,
-            embedding_function=self.embedder,
+            documents=chunks_with_ids,
+            embedding=self.embedder,
+            ids=[chunk.metadata["id"] for chunk in chunks_with_ids],
             persist_directory=chroma_path
         )
         vector_db.persist()
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The app imports its packages as top-level modules (models, services, api).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+VOCABULARY = ["revenue", "cash", "segment", "guidance", "debt", "margin", "dividend", "inventory"]
+
+
+class FakeEmbedder:
+    """
+    Stands in for services.embedder.Embedder in tests: counts vocabulary words instead of
+    running the BERT model, so texts about the same topic land close together.
+    """
+    dimension = len(VOCABULARY)
+
+    def __init__(self, config=None):
+        pass
+
+    def embed(self, text) -> np.ndarray:
+        words = text.lower().split()
+        return np.array([sum(w.startswith(v) for w in words) for v in VOCABULARY], dtype=np.float32) + 1e-3
+
+    def embed_documents(self, texts):
+        return [self.embed(text).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed(text).tolist()
+
+
+@pytest.fixture
+def fake_embedder():
+    return FakeEmbedder()
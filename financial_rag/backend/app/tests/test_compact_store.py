@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain")
+
+from services.compact_store import CompactVectorStore, MODES, evaluate_modes, holdout_queries
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 32)).astype(np.float32)
+    return (centers[rng.integers(0, 20, 500)] + 0.2 * rng.normal(size=(500, 32))).astype(np.float32)
+
+
+def build(mode, vectors):
+    ids = [str(i) for i in range(len(vectors))]
+    return CompactVectorStore(mode=mode, pq_subspaces=8, pq_centroids=16).build(
+        ids, vectors, [f"chunk {i}" for i in ids], [{"row": i} for i in range(len(vectors))])
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_search_finds_stored_vector(mode, vectors):
+    store = build(mode, vectors)
+
+    doc, distance = store.search(vectors[42], k=3)[0]
+
+    assert doc.page_content == "chunk 42"
+    assert doc.metadata == {"row": 42}
+    assert distance == pytest.approx(0.0, abs=1e-4)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_search_rejects_wrong_dimension(mode, vectors):
+    store = build(mode, vectors)
+
+    with pytest.raises(ValueError):
+        store.search(np.float32(1.0))
+    with pytest.raises(ValueError):
+        store.search(vectors[0][:16])
+
+
+def test_holdout_queries_are_not_indexed(vectors):
+    indexed, queries = holdout_queries(vectors, 20)
+
+    assert (len(indexed), len(queries)) == (480, 20)
+    distances = np.sum((queries[:, None, :] - indexed[None, :, :]) ** 2, axis=2)
+    assert distances.min() > 0
+
+
+def test_evaluate_modes_reports_recall_per_mode(vectors):
+    indexed, queries = holdout_queries(vectors, 20)
+
+    report = evaluate_modes(indexed, queries, k=5, pq_subspaces=8, pq_centroids=16)
+
+    assert set(report) == set(MODES)
+    assert report["float32"]["recall@k"] == 1.0
+    assert all(0.9 <= entry["recall@k"] <= 1.0 for entry in report.values())
+    assert report["pq"]["bytes"] < report["int8"]["bytes"] < report["float16"]["bytes"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_save_and_load_memory_mapped(mode, vectors, tmp_path):
+    build(mode, vectors).save(str(tmp_path))
+
+    store = CompactVectorStore.load(str(tmp_path), mmap=True)
+
+    assert isinstance(store.codes, np.memmap)
+    assert isinstance(store._record_blob, np.memmap)
+    assert store.record(7) == ("7", "chunk 7", {"row": 7})
+    doc, _distance = store.search(vectors[42], k=1)[0]
+    assert (doc.page_content, doc.metadata) == ("chunk 42", {"row": 42})
@@ -0,0 +1,127 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain")
+
+from services.compact_store import CompactVectorStore
+from services.index_snapshots import SnapshotManager, HotSwapIndex
+
+
+def write_file(text):
+    def build(path):
+        with open(os.path.join(path, "data.txt"), "w") as f:
+            f.write(text)
+    return build
+
+
+def write_store(label, vectors):
+    def build(path):
+        n = len(vectors)
+        CompactVectorStore(mode="int8").build(
+            [str(i) for i in range(n)], vectors, [label] * n, [{}] * n).save(os.path.join(path, "compact"))
+    return build
+
+
+def test_versions_sort_in_publish_order(tmp_path):
+    manager = SnapshotManager(str(tmp_path))
+
+    published = [manager.publish(write_file(str(i))) for i in range(20)]
+
+    assert manager.list_versions() == published
+    assert manager.current_version() == published[-1]
+
+
+def test_failed_build_leaves_current_version_live(tmp_path):
+    manager = SnapshotManager(str(tmp_path))
+    version = manager.publish(write_file("ok"))
+
+    def failing_build(path):
+        write_file("partial")(path)
+        raise RuntimeError("crash mid-ingest")
+
+    with pytest.raises(RuntimeError):
+        manager.publish(failing_build)
+
+    assert manager.current_version() == version
+    assert os.listdir(manager.versions_path) == [version]
+
+
+def test_hot_swap_keeps_old_store_usable(tmp_path):
+    vectors = np.random.default_rng(0).random((50, 8), dtype=np.float32)
+    manager = SnapshotManager(str(tmp_path))
+    manager.publish(write_store("old", vectors))
+    index = HotSwapIndex(manager)
+    old_store = index._current[1]
+
+    manager.publish(write_store("new", vectors))
+
+    assert index.refresh()
+    assert index.search(vectors[0], k=1)[0][0].page_content == "new"
+    assert old_store.search(vectors[0], k=1)[0][0].page_content == "old"
+
+
+def test_publish_collects_expired_versions(tmp_path):
+    manager = SnapshotManager(str(tmp_path), retention_seconds=0, keep=1)
+
+    versions = [manager.publish(write_file(str(i))) for i in range(3)]
+
+    assert manager.list_versions() == versions[-1:]
+
+
+def test_publish_keeps_versions_within_retention(tmp_path):
+    manager = SnapshotManager(str(tmp_path), retention_seconds=3600, keep=1)
+
+    versions = [manager.publish(write_file(str(i))) for i in range(3)]
+
+    assert manager.list_versions() == versions
+
+
+def test_gc_under_live_index_keeps_serving(tmp_path):
+    vectors = np.random.default_rng(0).random((50, 8), dtype=np.float32)
+    manager = SnapshotManager(str(tmp_path), retention_seconds=0, keep=2)
+    served = manager.publish(write_store("served", vectors))
+    index = HotSwapIndex(manager)
+
+    # Two publishes before the next poll collect the version the index is serving.
+    manager.publish(write_store("next", vectors))
+    manager.publish(write_store("latest", vectors))
+
+    assert served not in manager.list_versions()
+    assert index.version == served
+    assert index.search(vectors[0], k=1)[0][0].page_content == "served"
+
+
+def test_retention_counts_from_retirement(tmp_path):
+    manager = SnapshotManager(str(tmp_path), retention_seconds=3600, keep=1)
+    old = manager.publish(write_file("old"))
+    manager.publish(write_file("new"))
+    month_ago = time.time() - 30 * 24 * 3600
+    os.utime(manager.version_path(old), (month_ago, month_ago))
+
+    manager.rollback(old)
+    latest = manager.publish(write_file("latest"))
+
+    # old was built a month ago but only stopped being current just now.
+    assert old in manager.list_versions()
+    assert manager.current_version() == latest
+
+
+def test_publish_snapshot_from_chunks(tmp_path, fake_embedder):
+    pytest.importorskip("chromadb")
+    from langchain.schema import Document
+    from services.vector_db import VectorDB
+
+    chunks = [Document(page_content=text, metadata={"source": "report.pdf", "page": i})
+              for i, text in enumerate(["revenue", "cash flow", "segment results"])]
+    manager = SnapshotManager(str(tmp_path))
+
+    version = VectorDB(embedder=fake_embedder).publish_snapshot(
+        chunks, manager, store=CompactVectorStore(mode="float16"))
+
+    index = HotSwapIndex(manager)
+    assert index.version == version
+    doc, _distance = index.search(fake_embedder.embed("cash flow"), k=1)[0]
+    assert doc.page_content == "cash flow"
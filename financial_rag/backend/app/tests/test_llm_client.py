@@ -0,0 +1,134 @@
+import time
+import threading
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+from models.llm_client import LLMClient
+from models.stub_llm_server import StubLLMServer
+
+
+PRICES = {"gpt-4o-mini": {"input": 1.0, "output": 2.0}}
+
+
+def make_client(server, **kwargs):
+    kwargs.setdefault("backoff_base", 0.001)
+    kwargs.setdefault("backoff_max", 0.01)
+    return LLMClient(api_key="test", base_url=server.base_url, prices=PRICES, **kwargs)
+
+
+def user(content):
+    return [{"role": "user", "content": content}]
+
+
+def run_concurrently(n, target):
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_identical_concurrent_prompts_are_coalesced():
+    with StubLLMServer(latency=0.3) as server:
+        client = make_client(server)
+
+        results = run_concurrently(10, lambda i: client.chat(user("hello")))
+
+        assert results == ["Stub response to: hello"] * 10
+        assert server.request_count == 1
+        assert client.usage.summary()["gpt-4o-mini"]["requests"] == 1
+
+
+def test_different_prompts_are_not_coalesced():
+    with StubLLMServer(latency=0.1) as server:
+        client = make_client(server)
+
+        run_concurrently(3, lambda i: client.chat(user(f"prompt {i}")))
+
+        assert server.request_count == 3
+
+
+@pytest.mark.parametrize("status", [429, 500])
+def test_retries_until_success(status):
+    with StubLLMServer(fail_first=2, fail_status=status) as server:
+        client = make_client(server)
+
+        assert client.chat(user("hi")) == "Stub response to: hi"
+        assert server.attempt_count == 3
+        assert server.request_count == 1
+
+
+def test_retry_after_header_is_honoured():
+    with StubLLMServer(fail_first=2, retry_after=0.2) as server:
+        client = make_client(server)
+
+        start = time.monotonic()
+        client.chat(user("hi"))
+
+        assert time.monotonic() - start >= 0.4
+
+
+def test_all_calls_succeed_under_heavy_rate_limiting():
+    with StubLLMServer(rate_limit_rate=0.5, retry_after=0.01) as server:
+        client = make_client(server, max_retries=30)
+
+        results = run_concurrently(20, lambda i: client.chat(user(f"prompt {i}")))
+
+        assert results == [f"Stub response to: prompt {i}" for i in range(20)]
+        assert server.request_count == 20
+
+
+def test_gives_up_after_max_retries():
+    with StubLLMServer(fail_first=10) as server:
+        client = make_client(server, max_retries=2)
+
+        with pytest.raises(openai.RateLimitError):
+            client.chat(user("hi"))
+        assert server.attempt_count == 3
+
+
+def test_deadline_bounds_the_call():
+    with StubLLMServer(latency=1.0) as server:
+        client = make_client(server, timeout=0.3)
+
+        start = time.monotonic()
+        with pytest.raises(openai.APITimeoutError):
+            client.chat(user("hi"))
+
+        assert time.monotonic() - start < 0.9
+
+
+def test_stream_yields_deltas_and_records_usage():
+    with StubLLMServer() as server:
+        client = make_client(server)
+
+        text = "".join(client.stream(user("stream me")))
+
+        assert text.strip() == "Stub response to: stream me"
+        usage = client.usage.summary()["gpt-4o-mini"]
+        assert usage["prompt_tokens"] == 2
+        assert usage["completion_tokens"] == 5
+
+
+def test_usage_and_cost_accounting():
+    with StubLLMServer() as server:
+        client = make_client(server)
+
+        client.chat(user("one two three"))
+        client.chat(user("four"), model="gpt-4o")
+
+        summary = client.usage.summary()
+        assert summary["gpt-4o-mini"] == {"requests": 1, "prompt_tokens": 3, "completion_tokens": 6,
+                                          "cost": pytest.approx((3 * 1.0 + 6 * 2.0) / 1_000_000)}
+        assert summary["gpt-4o"]["cost"] == 0.0
+        assert client.usage.total_cost == pytest.approx(15 / 1_000_000)
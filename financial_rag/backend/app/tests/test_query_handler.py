@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("transformers")
+
+from langchain_community.vectorstores.chroma import Chroma
+
+from api.query_handler import QueryHandler
+from models.model_loader import ModelLoader
+
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "util")
+CHUNKS = [
+    "Revenue grew 10% year over year to $12 billion.",
+    "Cash and equivalents rose to $5 billion at quarter end.",
+    "The cloud segment delivered the strongest growth.",
+    "Management raised full year guidance.",
+]
+
+
+@pytest.fixture(params=[False], ids=["chunks"])
+def query_handler(request, tmp_path, monkeypatch, fake_embedder):
+    chroma_path = str(tmp_path / "chroma")
+    Chroma.from_texts(texts=CHUNKS, embedding=fake_embedder, persist_directory=chroma_path)
+
+    for variable in ("SHARDS_PATH", "SNAPSHOTS_PATH", "COMPACT_STORE_PATH", "SUMMARY_CHROMA_PATH"):
+        monkeypatch.delenv(variable, raising=False)
+    monkeypatch.setenv("CHROMA_PATH", chroma_path)
+    monkeypatch.setattr(ModelLoader, "load_embedding_model", lambda self: None)
+    # Same shape contract as the real model: one text squeezes to a 1-D vector.
+    monkeypatch.setattr(ModelLoader, "get_embeddings",
+                        lambda self, text: np.squeeze(np.stack([fake_embedder.embed(t) for t in text])))
+    prompts = []
+    monkeypatch.setattr(ModelLoader, "query_openai",
+                        lambda self, messages, **params: prompts.append(messages) or "answer")
+
+    summary_path = str(tmp_path / "summaries")
+    Chroma.from_texts(texts=["Sector summary 2024-Q2: cash balances rose across the technology sector.",
+                             "Sector summary 2024-Q1: cash balances fell across the technology sector.",
+                             "Company summary 2024-Q2: Apple cash rose.",
+                             "Page summary: cash note."],
+                      metadatas=[{"level": "sector_quarter", "sector": "technology", "period": "2024-Q2"},
+                                 {"level": "sector_quarter", "sector": "technology", "period": "2024-Q1"},
+                                 {"level": "company_quarter", "sector": "technology", "company": "Apple",
+                                  "period": "2024-Q2"},
+                                 {"level": "page", "period": "2024-Q2"}],
+                      embedding=fake_embedder,
+                      persist_directory=summary_path)
+    if request.param:
+        monkeypatch.setenv("SUMMARY_CHROMA_PATH", summary_path)
+
+    handler = QueryHandler({"embedding_model": "fake", "openai_api_key": "test"}, TEMPLATES_PATH)
+    return handler, prompts
+
+
+def test_process_query_puts_nearest_chunk_in_context(query_handler):
+    handler, prompts = query_handler
+
+    assert handler.process_query("What is the cash position?") == "answer"
+
+    context = prompts[0][1]["content"]
+    assert context.startswith("Context: Cash and equivalents rose to $5 billion")
+
+
+@pytest.mark.parametrize("query_handler", [True], ids=["summaries"], indirect=True)
+def test_broad_query_is_answered_from_summaries(query_handler):
+    handler, prompts = query_handler
+
+    handler.process_query("Which sectors had the strongest cash position?")
+
+    context = prompts[0][1]["content"]
+    assert context.startswith("Context: Sector summary")
+    assert "Page summary" not in context
+    assert "Cash and equivalents" not in context
+
+
+@pytest.mark.parametrize("query_handler", [True], ids=["summaries"], indirect=True)
+@pytest.mark.parametrize("query, period", [
+    ("What were the top performing sectors last quarter?", "2024-Q2"),
+    ("How did the market do in Q1 2024?", "2024-Q1"),
+    ("How was cash across sectors in the 2nd quarter 2024?", "2024-Q2"),
+])
+def test_broad_query_is_restricted_to_its_period(query_handler, query, period):
+    handler, prompts = query_handler
+
+    handler.process_query(query)
+
+    context = prompts[0][1]["content"]
+    assert context.startswith("Context: ")
+    summaries = context[len("Context: "):].split("\nQuery:")[0].split("\n\n---\n\n")
+    assert summaries and all(period in summary for summary in summaries)
+
+
+@pytest.mark.parametrize("query_handler", [True], ids=["summaries"], indirect=True)
+def test_company_query_with_period_stays_on_chunks(query_handler):
+    handler, prompts = query_handler
+
+    handler.process_query("How did Apple's cash change in Q2 2024?")
+
+    assert prompts[0][1]["content"].startswith("Context: Cash and equivalents rose to $5 billion")
+
+
+@pytest.mark.parametrize("query_handler", [True], ids=["summaries"], indirect=True)
+def test_single_company_query_stays_on_chunks(query_handler):
+    handler, prompts = query_handler
+
+    handler.process_query("How did cash change across segments?")
+
+    assert prompts[0][1]["content"].startswith("Context: Cash and equivalents rose to $5 billion")
+
+
+@pytest.mark.parametrize("query, broad", [
+    ("What were the top performing sectors last quarter?", True),
+    ("Which industry grew fastest?", True),
+    ("Rank the companies by revenue growth", True),
+    ("Who were the worst-performing names?", True),
+    ("How did revenue change across segments?", False),
+    ("Compare this quarter to last", False),
+    ("What's the management's outlook for the next quarter?", False),
+    ("How did the market do in Q2 2024?", True),
+    ("What happened in 2023?", True),
+    ("How did Apple do in Q2 2024?", False),
+])
+def test_is_broad_query(query_handler, query, broad):
+    handler, _prompts = query_handler
+
+    assert handler.is_broad_query(query, companies={"Apple"}) is broad
@@ -0,0 +1,105 @@
+import os
+import multiprocessing
+
+import numpy as np
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("transformers")
+
+from langchain.schema import Document
+from langchain_community.vectorstores.chroma import Chroma
+
+from services.sharded_vector_db import ShardedVectorDB, shard_name
+
+
+COMPANIES = {"Apple": "technology", "Microsoft": "technology", "JPMorgan": "banking", "Exxon": "energy"}
+TOPICS = ["revenue grew", "cash balance rose", "segment margin widened", "guidance raised",
+          "debt repaid", "dividend increased"]
+
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                                reason="build workers must inherit the patched Embedder")
+
+
+def make_chunks():
+    chunks = []
+    for company, sector in COMPANIES.items():
+        for page, topic in enumerate(TOPICS):
+            chunks.append(Document(page_content=f"{company} {topic} {'cash ' * (page % 3)}",
+                                   metadata={"source": f"data/{sector}/{company}/q2.pdf", "page": page,
+                                             "company": company, "sector": sector}))
+    return chunks
+
+
+def stored_ids(sharded_db):
+    ids = set()
+    for name in sharded_db.shard_names():
+        ids.update(Chroma(persist_directory=os.path.join(sharded_db.shards_path, name)).get()["ids"])
+    return ids
+
+
+def hits(results):
+    # Sorted so chunks at equal distance compare the same whichever shard returned them first.
+    return sorted((round(distance, 4), doc.page_content) for doc, distance in results)
+
+
+@pytest.fixture
+def sharded_db(tmp_path, monkeypatch, fake_embedder):
+    monkeypatch.setattr("services.embedder.Embedder", type(fake_embedder))
+    config = {"sharding": {"partition_by": "company", "workers": 2}}
+    db = ShardedVectorDB(config, str(tmp_path / "shards"), embedder=fake_embedder)
+    yield db
+    db.close()
+
+
+def test_shard_name_partitions():
+    metadata = {"source": "data/technology/Apple Inc/q2.pdf", "company": "Apple Inc", "sector": "technology"}
+
+    assert shard_name(metadata, "company", 8) == "apple_inc"
+    assert shard_name(metadata, "sector", 8) == "technology"
+    assert shard_name({}, "company", 8) == "unassigned"
+    assert shard_name(metadata, "hash", 8) == shard_name(dict(metadata, page=3), "hash", 8)
+    assert shard_name(metadata, "hash", 8).startswith("shard_")
+
+
+def test_node_slices_build_every_shard_and_search_merges_top_k(sharded_db, fake_embedder):
+    chunks = make_chunks()
+    assert sorted(sharded_db.partition(chunks)) == ["apple", "exxon", "jpmorgan", "microsoft"]
+
+    sharded_db.build(chunks, node_index=0, num_nodes=2)
+    assert sharded_db.shard_names() == ["apple", "jpmorgan"]
+    sharded_db.build(chunks, node_index=1, num_nodes=2)
+    assert sharded_db.shard_names() == ["apple", "exxon", "jpmorgan", "microsoft"]
+
+    query = fake_embedder.embed("cash dividend")
+    results = sharded_db.search(query, k=5)
+
+    distances = {chunk.page_content: float(np.sum((fake_embedder.embed(chunk.page_content) - query) ** 2))
+                 for chunk in chunks}
+    assert [distance for _doc, distance in results] == sorted(distance for _doc, distance in results)
+    assert [round(d, 4) for _doc, d in results] == [round(d, 4) for d in sorted(distances.values())[:5]]
+    assert {doc.metadata["company"] for doc, _distance in sharded_db.search(query, k=5, shards=["exxon"])} \
+        == {"Exxon"}
+
+
+def test_merge_and_rebalance_preserve_ids_and_results(sharded_db, fake_embedder, tmp_path):
+    chunks = make_chunks()
+    sharded_db.build(chunks)
+    query = fake_embedder.embed("cash dividend")
+    ids = stored_ids(sharded_db)
+    expected = hits(sharded_db.search(query, k=len(chunks)))
+    assert len(ids) == len(expected) == len(chunks)
+
+    sharded_db.merge_shards(["apple", "microsoft"], "technology", remove_sources=True)
+
+    assert sharded_db.shard_names() == ["exxon", "jpmorgan", "technology"]
+    assert stored_ids(sharded_db) == ids
+    assert hits(sharded_db.search(query, k=len(chunks))) == expected
+
+    rebalanced = sharded_db.rebalance(str(tmp_path / "rebalanced"), partition_by="hash", num_shards=3)
+    try:
+        assert set(rebalanced.shard_names()) <= {"shard_000", "shard_001", "shard_002"}
+        assert stored_ids(rebalanced) == ids
+        assert hits(rebalanced.search(query, k=len(chunks))) == expected
+    finally:
+        rebalanced.close()
@@ -0,0 +1,96 @@
+import hashlib
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+from langchain.schema import Document
+
+from services.summary_index import SummaryIndexBuilder, report_period, query_periods
+
+
+class FakeModelLoader:
+    def __init__(self, words=5):
+        self.words = words
+        self.calls = 0
+
+    def query_openai(self, messages):
+        self.calls += 1
+        digest = hashlib.sha256(messages[1]["content"].encode("utf-8")).hexdigest()[:8]
+        return " ".join([digest] * self.words)
+
+
+def pages(companies="AB", n_pages=6, text="x" * 400):
+    return [Document(page_content=f"{text} {company} {page}",
+                     metadata={"source": f"/data/Tech/{company}/1stqtr24.pdf", "page": page,
+                               "sector": "Tech", "company": company})
+            for company in companies for page in range(n_pages)]
+
+
+def make_builder(tmp_path, model_loader, **kwargs):
+    return SummaryIndexBuilder(model_loader, None, str(tmp_path), section_pages=3, **kwargs)
+
+
+@pytest.mark.parametrize("source, period", [
+    ("/data/Finance/Berkshire Hathaway/1stqtr24.pdf", "2024-Q1"),
+    ("Q3-2024 results.pdf", "2024-Q3"),
+    ("2024Q2.pdf", "2024-Q2"),
+    ("2023ar.pdf", "2023-FY"),
+    ("10k.pdf", "unknown"),
+])
+def test_report_period(source, period):
+    assert report_period(source) == period
+
+
+@pytest.mark.parametrize("query, periods", [
+    ("How did tech do in Q2 2024?", ["2024-Q2"]),
+    ("Top sectors in 2024", ["2024-Q1", "2024-Q2"]),
+    ("Top sectors in 2022", ["2022-FY"]),
+    ("Best performing sectors last quarter", ["2024-Q2"]),
+    ("Which sectors grew fastest?", []),
+])
+def test_query_periods(query, periods):
+    assert query_periods(query, {"2023-Q4", "2024-Q1", "2024-Q2", "2023-FY"}) == periods
+
+
+def test_build_produces_every_level(tmp_path):
+    summaries = make_builder(tmp_path, FakeModelLoader()).build(pages())
+
+    levels = [summary.metadata["level"] for summary in summaries]
+    assert levels.count("page") == 12
+    assert levels.count("section") == 4
+    assert levels.count("report") == 2
+    assert levels.count("company_quarter") == 2
+    assert levels.count("sector_quarter") == 1
+
+
+def test_rebuild_only_resummarizes_changed_path(tmp_path):
+    documents = pages()
+    make_builder(tmp_path, FakeModelLoader()).build(documents)
+
+    documents[0].page_content = "changed " * 100
+    model_loader = FakeModelLoader()
+    make_builder(tmp_path, model_loader).build(documents)
+
+    # page, section, report, company_quarter, sector_quarter
+    assert model_loader.calls == 5
+
+
+def test_summaries_are_cut_to_max_words(tmp_path):
+    summaries = make_builder(tmp_path, FakeModelLoader(words=500), max_words=20).build(pages())
+
+    assert max(len(summary.page_content.split()) for summary in summaries) == 20
+
+
+def test_unused_cache_entries_are_dropped(tmp_path):
+    documents = pages()
+    builder = make_builder(tmp_path, FakeModelLoader())
+    builder.build(documents)
+    cache_size = len(builder.cache)
+
+    for _ in range(3):
+        documents[0].page_content += " more"
+        builder = make_builder(tmp_path, FakeModelLoader())
+        builder.build(documents)
+
+    assert len(builder.cache) == cache_size